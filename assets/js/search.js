@@ -1,8 +1,15 @@
+// search.json pools judge/court strings: {judges:[...], courts:[...], cases:[{judge:<idx>, court:<idx>, ...}]}
+function expandIndex(data){
+  if(Array.isArray(data)) return data;
+  const judges = data.judges || [], courts = data.courts || [];
+  return (data.cases || []).map(c => Object.assign({}, c, { judge: judges[c.judge] || '', court: courts[c.court] || '' }));
+}
+
 async function loadIndex(){
   try{
     const base = (typeof window !== 'undefined' && window.__base) ? window.__base : '/';
     const r = await fetch(base + '_data/search.json');
-    return await r.json();
+    return expandIndex(await r.json());
   }catch(e){ return []; }
 }
 
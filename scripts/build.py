@@ -1,56 +1,146 @@
-import re, json, unicodedata
+import hashlib, html, io, os, re, json, shutil, sys, unicodedata
+from functools import lru_cache
+from json.encoder import encode_basestring
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from pypdf import PdfReader
+
+try:
+    import pymupdf
+except ImportError:  # pure-Python fallback
+    pymupdf = None
+    from pypdf import PdfReader
+PDF_BACKEND = "pymupdf" if pymupdf else "pypdf"
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
 
 ROOT = Path(__file__).resolve().parents[1]
 RULINGS = ROOT / "rulings"
 CASES   = ROOT / "_cases"
 DATA    = ROOT / "_data"
-CASES.mkdir(exist_ok=True, parents=True)
-DATA.mkdir(exist_ok=True, parents=True)
+
+def dump_json(obj, pretty=True) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def load_json(path: Path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    return json.loads(path.read_text(encoding="utf-8"))
 
 VOL_FILE = DATA / "volumes.json"
-if not VOL_FILE.exists():
-    VOL_FILE.write_text(json.dumps({"current_volume": 1, "next_page": 1, "max_pages_per_volume": 800}, indent=2))
-vol_state = json.loads(VOL_FILE.read_text())
+MANIFEST_FILE = DATA / "build_manifest.json"
+PDF_CACHE = DATA / "_pdf_cache"
+
+def load_vol_state():
+    if not VOL_FILE.exists():
+        VOL_FILE.write_bytes(dump_json({"current_volume": 1, "next_page": 1, "max_pages_per_volume": 800}))
+    return load_json(VOL_FILE)
 
 PAGE_CHAR_BUDGET = 1800
 
+# ASCII classes for patterns run on NFKC-normalized text; _FILENAME sees the raw pdf.stem, so it keeps \s/\d.
+_HDR_LINE   = re.compile(r"^[A-Za-z][A-Za-z .]*[ \t]*:")
+_YEAR       = re.compile(r"(20[0-9]{2}|19[0-9]{2})")
+_NONALNUM   = re.compile(r"[^a-z0-9]+")
+_FILENAME   = re.compile(r"^([A-Z]{2,}-\d{1,}-\d{2,})\s+(.*)$")
+_DOUBLE_NL  = re.compile(r"\n{2,}")
+
+def esc(t: str) -> str:
+    return html.escape(t, quote=False)
+
 def normalize(s: str) -> str:
-    return unicodedata.normalize("NFKC", s or "").strip()
+    s = s or ""
+    # ASCII is already NFKC; isascii() is a flag check, so skip the normalizer call.
+    return (s if s.isascii() else unicodedata.normalize("NFKC", s)).strip()
 
-def read_pdf_text(pdf_path: Path) -> str:
-    reader = PdfReader(str(pdf_path))
+# Text can only be drawn with a font, so a page whose resources list no fonts (a scanned image)
+# has no text layer; skip it rather than decoding its image streams to find nothing.
+def _pypdf_has_text_layer(page) -> bool:
+    res = page["/Resources"] if "/Resources" in page else {}
+    if "/Font" in res: return True
+    xobjs = res["/XObject"] if "/XObject" in res else {}
+    return not xobjs or any(x.get_object().get("/Subtype") != "/Image" for x in xobjs.values())
+
+def read_pdf_text(pdf_path: Path, data: bytes = None) -> str:
+    """Extract the text of every page; parses `data` in memory when the caller already read the file."""
+    if pymupdf is not None:
+        with (pymupdf.open(stream=data, filetype="pdf") if data is not None else pymupdf.open(str(pdf_path))) as doc:
+            return "\n".join(page.get_text("text") if page.get_fonts() else "" for page in doc)
+    reader = PdfReader(io.BytesIO(data) if data is not None else str(pdf_path), strict=False)  # lenient parse; metadata is never read
     parts = []
     for page in reader.pages:
+        try:
+            has_text = _pypdf_has_text_layer(page)
+        except Exception:
+            has_text = True  # malformed resources: let extract_text decide
+        if not has_text:
+            parts.append("")
+            continue
         try:
             parts.append(page.extract_text() or "")
         except Exception:
             parts.append("")
     return "\n".join(parts)
 
+def read_pdf_text_cached(pdf_path: Path, digest: str = None):
+    """read_pdf_text, memoized on disk by the PDF's SHA-1 and the extraction backend.
+    Pass `digest` when the manifest shows the PDF unchanged to skip re-hashing it.
+    Returns (text, digest)."""
+    data = None
+    if digest is None:
+        data = pdf_path.read_bytes()
+        digest = hashlib.sha1(data).hexdigest()
+    path = PDF_CACHE / f"{digest}-{PDF_BACKEND}.txt"
+    if path.exists():
+        return path.read_bytes().decode("utf-8"), digest
+    text = read_pdf_text(pdf_path, data)  # parse the bytes already read for hashing
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(text.encode("utf-8"))
+    os.replace(tmp, path)
+    return text, digest
+
 def split_header_body(full_text: str):
-    lines = [normalize(l) for l in full_text.splitlines()]
+    """Split already-normalize()d text into header lines and body text."""
+    lines = [l.strip() for l in full_text.splitlines()]
     header_lines, i = [], 0
     while i < len(lines) and len(header_lines) < 60:
         ln = lines[i]
         if not ln:
             if header_lines: i += 1; break
             i += 1; continue
-        if re.search(r"^[A-Za-z][A-Za-z .]*\s*:", ln):
+        if _HDR_LINE.match(ln):
             header_lines.append(ln); i += 1
         else:
             break
     body_text = "\n".join(lines[i:]) if i < len(lines) else ""
     return header_lines, body_text
 
+HEADER_KEYS = frozenset(("case_title", "docket", "decision_date", "court", "judge",
+                         "disposition", "keywords", "reporter_override", "slip_override"))
+_KEY_ALIASES = HEADER_KEYS | {"title"}
+_OVERRIDE_KEYS = frozenset(("reporter_override", "slip_override"))
+
 def parse_header(header_lines):
-    M = {}
+    M, found = {}, 0
     for ln in header_lines:
-        m = re.match(r"^([A-Za-z][A-Za-z .]*?)\s*:\s*(.*)$", ln)
-        if not m: continue
-        key = m.group(1).strip().lower().replace(" ", "_")
-        M[key] = m.group(2).strip()
+        # "Case Title: ..." -> ("case_title", "..."); partition is cheaper than a regex per line.
+        key, sep, val = ln.partition(":")
+        if not sep or "_" in key: continue
+        key = key.rstrip(" \t").lower().replace(" ", "_")
+        if key not in _KEY_ALIASES or key in M: continue  # first match wins
+        val = val.strip()
+        if key in _OVERRIDE_KEYS and val.startswith("#"): val = ""  # "# leave blank ..." template hints
+        M[key] = val
+        if key in HEADER_KEYS:
+            found += 1
+            if found == len(HEADER_KEYS): break
     return {
         "case_title": M.get("case_title") or M.get("title") or "",
         "docket": M.get("docket") or "",
@@ -63,12 +153,14 @@ def parse_header(header_lines):
         "slip_override": M.get("slip_override") or "",
     }
 
+@lru_cache(maxsize=4096)
 def year_from_date(s: str) -> str:
-    m = re.search(r"(20\d{2}|19\d{2})", s or ""); return m.group(1) if m else ""
+    m = _YEAR.search(s or ""); return m.group(1) if m else ""
 
+@lru_cache(maxsize=4096)
 def make_slug(s: str) -> str:
     s = normalize(s).lower()
-    s = re.sub(r"[^a-z0-9]+","-",s).strip("-")
+    s = _NONALNUM.sub("-", s).strip("-")
     return s or "case"
 
 def ensure_volume(vol_state):
@@ -83,40 +175,37 @@ def reserve_pages(vol_state, body_text: str):
     vol_state["next_page"] = end + 1
     return start, end
 
-def inject_page_markers(volume: int, page_start: int, body_text: str) -> str:
-    chunks, remaining, idx = [], body_text, 0
-    while remaining:
-        take = remaining[:PAGE_CHAR_BUDGET]; remaining = remaining[PAGE_CHAR_BUDGET:]
-        if idx == 0:
-            chunks.append(take)
-        else:
-            cite = f"{volume} M.2d {page_start + idx}"
-            chunks.append(f"\n\n<hr class=\"page-marker\" data-cite=\"{cite}\">\n\n{take}")
-        idx += 1
-    return "".join(chunks)
-
-def normalize_paragraphs(txt: str) -> str:
+def split_paragraphs(txt: str) -> list:
     """
     Preserve true paragraph breaks, but join hard-wrapped lines into sentences.
-    1) Mark paragraph breaks (2+ newlines) with a token
-    2) Replace remaining single newlines with spaces
-    3) Restore paragraph breaks
+    1) Split on paragraph breaks (2+ newlines)
+    2) Within each paragraph, collapse every whitespace run (wrapped newlines included) to one space
+    `txt` comes from split_header_body's body, which is already rejoined with plain "\n".
+    """
+    return [p for p in (" ".join(block.split()) for block in _DOUBLE_NL.split(txt)) if p]
+
+_P_OPEN, _P_CLOSE = "<p>", "</p>"
+_MARKER_OPEN, _MARKER_CLOSE = "<hr class=\"page-marker\" data-cite=\"", "\">"
+_BLOCK_SEP = "\n\n"
+
+def iter_body_html(volume: int, page_start: int, body_text: str):
+    """
+    Yield the opinion as <p> blocks, cutting it into PAGE_CHAR_BUDGET pages.
+    Each page after the first opens with a page-marker <hr> emitted as its own
+    block, so markers never end up inside a paragraph.
     """
-    txt = txt.replace("\r\n","\n")
-    txt = re.sub(r"\n{2,}", "¶¶", txt)   # temporary paragraph token
-    txt = re.sub(r"\s*\n\s*", " ", txt)  # join wrapped lines
-    txt = re.sub(r"[ ]{2,}", " ", txt).strip()
-    txt = txt.replace("¶¶", "\n\n")
-    return txt
-
-def render_markdown_html(txt: str) -> str:
-    txt = normalize_paragraphs(txt)
-    paras = [p.strip() for p in re.split(r"\n\s*\n", txt) if p.strip()]
-    return "\n\n".join([f"<p>{p}</p>" for p in paras])
+    sep = ""
+    for idx, pos in enumerate(range(0, len(body_text), PAGE_CHAR_BUDGET)):
+        if idx:
+            yield f"{sep}{_MARKER_OPEN}{volume} M.2d {page_start + idx}{_MARKER_CLOSE}"
+            sep = _BLOCK_SEP
+        for p in split_paragraphs(esc(body_text[pos:pos + PAGE_CHAR_BUDGET])):
+            yield sep + _P_OPEN + p + _P_CLOSE
+            sep = _BLOCK_SEP
 
 def infer_from_filename(pdf: Path):
     stem = pdf.stem  # e.g. "CR-168-25 State of Mayflower v. Kash0507 Ruling"
-    m = re.match(r"^([A-Z]{2,}-\d{1,}-\d{2,})\s+(.*)$", stem)
+    m = _FILENAME.match(stem)
     docket, title = "", stem
     if m:
         docket = m.group(1)
@@ -130,34 +219,56 @@ def build_slipline(case_title, docket, court, decision_date):
     if tail: parts.append(f"({tail})")
     return ", ".join(parts)
 
-def write_case(pdf: Path, vol_state):
-    full_text = read_pdf_text(pdf)
-    header_lines, body_text = split_header_body(full_text)
-    H = parse_header(header_lines)
+FRONT_MATTER_KEYS = (
+    "layout", "title", "case_title", "reporter_cite", "decision_year", "decision_date",
+    "court", "judge", "disposition", "keywords", "volume", "page_start", "page_end",
+    "docket", "slug", "docket_slug", "pdf_path", "slipline", "prev_path", "next_path",
+)
+_FM_TMPL = "---\n" + "".join(f"{k}: {{{k}}}\n" for k in FRONT_MATTER_KEYS) + "---\n\n"
+
+def fm_value(v) -> str:
+    """Same text as json.dumps(v, ensure_ascii=False) for the types front matter holds, minus the encoder setup."""
+    t = type(v)
+    if t is str: return encode_basestring(v)
+    if t is int: return str(v)
+    if t is list and all(type(x) is str for x in v): return "[" + ", ".join(map(encode_basestring, v)) + "]"
+    return json.dumps(v, ensure_ascii=False)
+
+def extract_case(pdf: Path, digest: str = None):
+    """Parse one PDF without touching volume state; safe to run in a worker process."""
+    text, digest = read_pdf_text_cached(pdf, digest)
+    header_lines, body_text = split_header_body(normalize(text))
+    return pdf, digest, parse_header(header_lines), body_text
+
+def write_index_md(path: Path, front: str, body_fragments):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One join and one encode beat streaming fragments through the text IO layer.
+    path.write_bytes("".join((front, *body_fragments, "\n")).encode("utf-8"))
 
+def write_case(pdf: Path, H, body_text: str, vol_state, submit=None):
+    """Allocate pages and render one case; the index.md write goes through submit() if given."""
+    # H comes from parse_header over already-normalized text, so its values are NFKC and stripped.
     fn_docket, fn_title = infer_from_filename(pdf)
-    case_title = normalize(H["case_title"]) or fn_title or pdf.stem
-    docket = normalize(H["docket"]) or fn_docket
-    decision_date = normalize(H["decision_date"])
+    case_title = H["case_title"] or fn_title or pdf.stem
+    docket = H["docket"] or fn_docket
+    decision_date = H["decision_date"]
     decision_year = year_from_date(decision_date)
-    court = normalize(H["court"])
-    judge = normalize(H["judge"])
-    disposition = normalize(H["disposition"])
+    court = sys.intern(H["court"])  # shared by many cases
+    judge = sys.intern(H["judge"])
+    disposition = H["disposition"]
     keywords = H["keywords"]
 
     volume = vol_state["current_volume"]
     page_start, page_end = reserve_pages(vol_state, body_text)
-    reporter_cite = H["reporter_override"].strip() if H["reporter_override"] else f"{volume} M.2d {page_start}"
-    slipline = H["slip_override"].strip() if H["slip_override"] else build_slipline(case_title, docket, court, decision_date)
+    reporter_cite = H["reporter_override"] or f"{volume} M.2d {page_start}"
+    slipline = H["slip_override"] or build_slipline(case_title, docket, court, decision_date)
 
     docket_slug = make_slug(docket)
     title_slug = make_slug(case_title)
     path_slug = f"{page_start}-{title_slug}"
     out_dir = CASES / str(volume) / path_slug
-    out_dir.mkdir(parents=True, exist_ok=True)
 
-    body_with_markers = inject_page_markers(volume, page_start, body_text)
-    body_html = render_markdown_html(body_with_markers)
+    body_fragments = iter_body_html(volume, page_start, body_text)
 
     prev_path = f"/cases/{volume}/{page_start-1}/" if page_start > 1 else ""
     next_path = f"/cases/{volume}/{page_end+1}/"
@@ -179,14 +290,15 @@ def write_case(pdf: Path, vol_state):
       "docket": docket,
       "slug": title_slug,
       "docket_slug": docket_slug,
-      "pdf_path": str(pdf.relative_to(ROOT)).replace("\\", "/"),
+      "pdf_path": pdf.relative_to(ROOT).as_posix(),
       "slipline": slipline,
       "prev_path": prev_path,
       "next_path": next_path,
     }
 
-    md = "---\n" + "\n".join([f"{k}: {json.dumps(v, ensure_ascii=False)}" for k,v in fm.items()]) + "\n---\n\n" + body_html + "\n"
-    (out_dir / "index.md").write_text(md, encoding="utf-8")
+    front = _FM_TMPL.format_map({k: fm_value(v) for k, v in fm.items()})
+    if submit: submit(write_index_md, out_dir / "index.md", front, body_fragments)
+    else: write_index_md(out_dir / "index.md", front, body_fragments)
 
     return {
       "title": case_title,
@@ -202,21 +314,95 @@ def write_case(pdf: Path, vol_state):
       "path": f"/cases/{volume}/{path_slug}/"
     }
 
+def iter_pdfs(root: Path):
+    """Yield (path, stat) for the PDF files directly under root, in name order."""
+    with os.scandir(root) as it:
+        entries = sorted((e for e in it if e.name.endswith(".pdf") and e.is_file()), key=lambda e: e.name)
+    for e in entries:
+        yield Path(e.path), e.stat()
+
+def pack_search_index(items):
+    """Store each distinct judge/court string once; cases refer to them by index."""
+    judges, courts, cases = {}, {}, []
+    for it in items:
+        c = dict(it)
+        c["judge"] = judges.setdefault(it["judge"], len(judges))
+        c["court"] = courts.setdefault(it["court"], len(courts))
+        cases.append(c)
+    return {"judges": list(judges), "courts": list(courts), "cases": cases}
+
+CITE_ORDER = itemgetter("volume", "page_start")
+
+def case_index_path(item) -> Path:
+    return CASES.joinpath(*item["path"].strip("/").split("/")[1:], "index.md")
+
 def main():
-    items = []
-    for pdf in sorted(RULINGS.glob("*.pdf")):
-        item = write_case(pdf, vol_state)
-        if item: items.append(item)
-
-    VOL_FILE.write_text(json.dumps(vol_state, indent=2), encoding="utf-8")
-    (DATA / "search.json").write_text(json.dumps(items, indent=2), encoding="utf-8")
-
-    rows = sorted(items, key=lambda x:(x["volume"], x["page_start"]))
-    table = "\n".join([f"- [{r['reporter_cite']}]({r['path']}) — {r.get('judge','')}" for r in rows])
-    (ROOT / "citator.md").write_text(
-        "---\nlayout: default\ntitle: Citator\n---\n\n# Citator\n\n" + table + "\n",
-        encoding="utf-8"
-    )
+    for d in (CASES, DATA, PDF_CACHE):  # once per build, not per case or per worker import
+        d.mkdir(parents=True, exist_ok=True)
+    vol_state = load_vol_state()
+    manifest = load_json(MANIFEST_FILE) if MANIFEST_FILE.exists() else {}
+    # Cached items hold pages allocated against the saved volumes.json and HTML rendered by this
+    # build.py and backend; if volumes.json was edited or either changed, re-paginate and re-render all.
+    render = hashlib.sha1(Path(__file__).read_bytes() + PDF_BACKEND.encode()).hexdigest()
+    reusable = manifest.get("render") == render and manifest.get("vol_state") == vol_state
+    old = manifest.get("files", {})
+
+    # Reuse the previous result for PDFs whose mtime/size are unchanged and whose page still exists.
+    # An unchanged PDF whose page was deleted keeps its recorded SHA-1, so the text cache is hit without re-hashing.
+    pdfs, stats, cached, digests, todo, known, stale = [], {}, {}, {}, [], [], []
+    for pdf, st in iter_pdfs(RULINGS):
+        pdfs.append(pdf)
+        key = pdf.relative_to(ROOT).as_posix()
+        stats[pdf] = (key, st.st_mtime_ns, st.st_size)
+        entry = old.get(key)
+        unchanged = entry is not None and (entry["mtime_ns"], entry["size"]) == stats[pdf][1:]
+        if reusable and unchanged and case_index_path(entry["item"]).exists():
+            cached[pdf], digests[pdf] = entry["item"], entry.get("sha1")
+        else:
+            todo.append(pdf)
+            known.append(entry.get("sha1") if unchanged else None)
+            if entry is not None: stale.append(entry["item"])  # re-extracted cases get new pages
+
+    # Drop the pages of replaced and removed rulings so Jekyll doesn't publish them under their old cite.
+    live = {key for key, _, _ in stats.values()}
+    stale += [entry["item"] for key, entry in old.items() if key not in live]
+    for item in stale:
+        shutil.rmtree(case_index_path(item).parent, ignore_errors=True)
+
+    # Extraction runs in parallel; page allocation stays serial and in sorted order,
+    # and the rendered pages are written out on a thread pool.
+    if todo:
+        writes = []
+        # Don't spawn idle workers for a small incremental batch; hand out ~4 chunks per worker.
+        workers = min(len(todo), os.cpu_count() or 1)
+        chunksize = max(1, len(todo) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor() as io_pool:
+            def submit(*args):
+                writes.append(io_pool.submit(*args))
+            for pdf, digest, H, body_text in pool.map(extract_case, todo, known, chunksize=chunksize):
+                digests[pdf] = digest
+                item = write_case(pdf, H, body_text, vol_state, submit)
+                if item: cached[pdf] = item
+        for fut in writes: fut.result()  # re-raise any write error
+
+    items, new_manifest = [], {}
+    for pdf in pdfs:
+        item = cached.get(pdf)
+        if not item: continue
+        items.append(item)
+        key, mtime_ns, size = stats[pdf]
+        new_manifest[key] = {"mtime_ns": mtime_ns, "size": size, "sha1": digests.get(pdf), "item": item}
+
+    # A full build allocates pages in PDF order, so items are already in citation order;
+    # only reused manifest entries mixed with newly allocated cases need sorting.
+    if len(todo) != len(pdfs): items.sort(key=CITE_ORDER)
+
+    VOL_FILE.write_bytes(dump_json(vol_state))
+    MANIFEST_FILE.write_bytes(dump_json({"render": render, "vol_state": vol_state, "files": new_manifest}, pretty=False))
+    (DATA / "search.json").write_bytes(dump_json(pack_search_index(items), pretty=False))  # fetched by the site search
+
+    rows = "".join([f"- [{r['reporter_cite']}]({r['path']}) — {r.get('judge','')}\n" for r in items])
+    (ROOT / "citator.md").write_bytes(("---\nlayout: default\ntitle: Citator\n---\n\n# Citator\n\n" + rows).encode("utf-8"))
 
 if __name__ == "__main__":
     main()